@@ -0,0 +1,189 @@
+# wow_terminal/alerts.py (Watchlist rules evaluated on every ingested snapshot)
+import json
+import bisect
+import requests
+from datetime import datetime
+from typing import Dict, List, Optional
+from .database import Database
+from .quant import rsi
+
+# Metrics a rule can watch. Price metrics are gold, *_change metrics are % vs the previous snapshot.
+STAT_METRICS = ('min', 'avg', 'max', 'volume', 'listings')
+CHANGE_METRICS = ('avg_change', 'volume_change', 'listings_change')
+METRICS = STAT_METRICS + CHANGE_METRICS + ('rsi',)
+OPS = ('below', 'above')
+
+# Sinks: anything with send(alert: Dict)
+class StdoutSink:
+    def send(self, alert: Dict):
+        print(f"[ALERT] {alert['label'] or alert['rule_id']}: realm {alert['realm_id']} item {alert['item_id']} "
+              f"{alert['metric']} {alert['value']:.4f} {alert['op']} {alert['threshold']}")
+
+class FileSink:
+    def __init__(self, path: str = 'alerts.jsonl'):
+        self.path = path
+
+    def send(self, alert: Dict):
+        try:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(alert) + "\n")
+        except OSError as e:
+            print(f"Alert file sink error: {e}")
+
+class WebhookSink:
+    def __init__(self, url: str = 'http://localhost:8080/alerts', timeout: float = 2.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alert: Dict):
+        try:
+            requests.post(self.url, json=alert, timeout=self.timeout).raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"Alert webhook sink error: {e}")
+
+class _ThresholdBook:
+    """Rules for one (realm, item, metric), kept sorted by threshold per op."""
+    def __init__(self):
+        self.thresholds = {op: [] for op in OPS}
+        self.rules = {op: [] for op in OPS}
+        self.fresh = {}  # rule_id -> rule not yet evaluated; checked by level once, then edge-triggered
+
+    def add(self, rule: Dict, fresh: bool = False):
+        op = rule['op']
+        i = bisect.bisect_right(self.thresholds[op], rule['threshold'])
+        self.thresholds[op].insert(i, rule['threshold'])
+        self.rules[op].insert(i, rule)
+        if fresh: self.fresh[rule['rule_id']] = rule
+
+    def remove(self, rule_id: int) -> bool:
+        self.fresh.pop(rule_id, None)
+        for op in OPS:
+            for i, rule in enumerate(self.rules[op]):
+                if rule['rule_id'] == rule_id:
+                    del self.thresholds[op][i]
+                    del self.rules[op][i]
+                    return True
+        return False
+
+    def __len__(self):
+        return sum(len(r) for r in self.rules.values())
+
+    def crossed(self, value: float, prev: Optional[float]) -> List[Dict]:
+        # Edge-triggered: only rules whose condition became true since prev (all true ones on first sight).
+        below, above = self.thresholds['below'], self.thresholds['above']
+        # below fires when value < threshold -> thresholds in (value, prev]
+        lo = bisect.bisect_right(below, value)
+        hi = len(below) if prev is None else bisect.bisect_right(below, prev)
+        fired = self.rules['below'][lo:hi]
+        # above fires when value > threshold -> thresholds in [prev, value)
+        hi = bisect.bisect_left(above, value)
+        lo = 0 if prev is None else bisect.bisect_left(above, prev)
+        fired += self.rules['above'][lo:hi]
+        if self.fresh:
+            fired_ids = {r['rule_id'] for r in fired}
+            for rule in self.fresh.values():
+                holds = value < rule['threshold'] if rule['op'] == 'below' else value > rule['threshold']
+                if holds and rule['rule_id'] not in fired_ids: fired.append(rule)
+        return fired
+
+class AlertEngine:
+    def __init__(self, sinks: Optional[List] = None):
+        self.sinks = sinks if sinks is not None else [StdoutSink()]
+        self.books = {}  # (realm_id, item_id) -> {metric: _ThresholdBook}
+        self.reload()
+
+    def reload(self):
+        self.books = {}
+        rules = Database.get_alert_rules()
+        for rule in rules.to_dict('records'):
+            self._index(rule)
+
+    def _index(self, rule: Dict):
+        key = (int(rule['realm_id']), int(rule['item_id']))
+        book = self.books.setdefault(key, {}).setdefault(rule['metric'], _ThresholdBook())
+        book.add({
+            'rule_id': int(rule['rule_id']),
+            'metric': rule['metric'],
+            'op': rule['op'],
+            'threshold': float(rule['threshold']),
+            'label': rule.get('label') or ''
+        }, fresh=not rule.get('evaluated'))
+
+    def add_rule(self, realm_id: int, item_id: int, metric: str, op: str, threshold: float, label: str = "") -> Optional[int]:
+        if metric not in METRICS or op not in OPS:
+            raise ValueError(f"Invalid alert rule: {metric} {op}")
+        rule_id = Database.add_alert_rule(realm_id, item_id, metric, op, threshold, label)
+        if rule_id is not None:
+            self._index({'rule_id': rule_id, 'realm_id': realm_id, 'item_id': item_id,
+                         'metric': metric, 'op': op, 'threshold': threshold, 'label': label})
+        return rule_id
+
+    def remove_rule(self, rule_id: int):
+        Database.remove_alert_rule(rule_id)
+        for key, metrics in list(self.books.items()):
+            for metric, book in list(metrics.items()):
+                if book.remove(rule_id) and not book:
+                    del metrics[metric]
+            if not metrics:
+                del self.books[key]
+
+    def _metric_value(self, metric: str, realm_id: int, item_id: int, stats: Dict, prev: Optional[Dict]) -> Optional[float]:
+        if metric in STAT_METRICS:
+            return stats.get(metric)
+        if metric in CHANGE_METRICS:
+            base = metric[:-len('_change')]
+            old = prev.get(base) if prev else None
+            if not old: return None
+            return (stats.get(base, 0) - old) / old * 100
+        if metric == 'rsi':
+            value, _ = rsi(item_id, realm_id)
+            return value
+        return None
+
+    def evaluate(self, realm_id: int, snapshot: Dict[int, Dict], timestamp: Optional[int] = None) -> List[Dict]:
+        """Evaluate the rules of the items in snapshot ({item_id: analyzer stats}); returns fired alerts.
+
+        Previous stats and last metric values live in the alert_state table, so change metrics and
+        edge triggering carry over between runs.
+        """
+        timestamp = timestamp or int(datetime.now().timestamp())
+        watched = [iid for iid, stats in snapshot.items() if stats and (realm_id, iid) in self.books]
+        state = Database.get_alert_state(realm_id, watched)
+        new_state = {}
+        settled = []  # Fresh rules that saw their first value
+        alerts = []
+        for item_id in watched:
+            stats = snapshot[item_id]
+            key = (realm_id, item_id)
+            prev = {m: state[(item_id, 'prev:' + m)] for m in STAT_METRICS if (item_id, 'prev:' + m) in state}
+            for m in STAT_METRICS:
+                if stats.get(m) is not None: new_state[(item_id, 'prev:' + m)] = stats[m]
+            for metric, book in self.books[key].items():
+                try:
+                    value = self._metric_value(metric, realm_id, item_id, stats, prev)
+                except Exception as e:
+                    print(f"Alert metric error: {e}")
+                    continue
+                if value is None or value != value: continue  # Missing or NaN
+                value = float(value)
+                for rule in book.crossed(value, state.get((item_id, metric))):
+                    alerts.append({
+                        'rule_id': rule['rule_id'],
+                        'label': rule['label'],
+                        'realm_id': realm_id,
+                        'item_id': item_id,
+                        'metric': metric,
+                        'op': rule['op'],
+                        'threshold': rule['threshold'],
+                        'value': value,
+                        'timestamp': timestamp
+                    })
+                new_state[(item_id, metric)] = value
+                settled.extend(book.fresh)
+                book.fresh.clear()
+        Database.set_alert_state(realm_id, new_state)
+        Database.mark_alert_rules_evaluated(settled)
+        for alert in alerts:
+            for sink in self.sinks:
+                sink.send(alert)
+        return alerts
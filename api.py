@@ -44,6 +44,18 @@ class BlizzardAPI:
         except ValueError as ve:
             raise ve  # Propagate token errors
 
+    def fetch_raw(self, endpoint: str, namespace: str = "dynamic-classic-us", locale: str = "en_US") -> bytes:
+        # Undecoded response body, so JSON parsing can happen in a worker process
+        try:
+            token = self._get_token()
+            url = f"https://{self.region}.api.blizzard.com{endpoint}?namespace={namespace}&locale={locale}"
+            headers = {"Authorization": f"Bearer {token}"}
+            response = requests.get(url, headers=headers)
+            response.raise_for_status()
+            return response.content
+        except requests.exceptions.RequestException as e:
+            raise ValueError(f"API fetch failed for {endpoint}: {str(e)}")
+
     def get_connected_realm_id(self, realm_name: str) -> Optional[int]:
         try:
             index_data = self.fetch("/data/wow/connected-realm/index")
@@ -77,3 +89,10 @@ class BlizzardAPI:
         except ValueError as e:
             print(f"Error fetching auctions for realm {connected_realm_id}: {e}")
             return {"auctions": []}
+
+    def get_auctions_raw(self, connected_realm_id: int) -> bytes:
+        try:
+            return self.fetch_raw(f"/data/wow/connected-realm/{connected_realm_id}/auctions")
+        except ValueError as e:
+            print(f"Error fetching auctions for realm {connected_realm_id}: {e}")
+            return b'{"auctions": []}'
@@ -2,6 +2,7 @@
 import sqlite3
 import pandas as pd
 from datetime import datetime, timedelta
+from typing import Dict, List, Optional
 
 DB_FILE = 'wow_economy.db'
 
@@ -23,6 +24,66 @@ class Database:
                     PRIMARY KEY (timestamp, realm_id, item_id)
                 )
             """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS alert_rules (
+                    rule_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    realm_id INTEGER,
+                    item_id INTEGER,
+                    metric TEXT,
+                    op TEXT,
+                    threshold REAL,
+                    label TEXT,
+                    enabled INTEGER DEFAULT 1,
+                    evaluated INTEGER DEFAULT 0
+                )
+            """)
+            # evaluated = 0 until a rule first sees a value; that first check is level- rather than edge-triggered
+            if 'evaluated' not in [c[1] for c in cursor.execute("PRAGMA table_info(alert_rules)")]:
+                cursor.execute("ALTER TABLE alert_rules ADD COLUMN evaluated INTEGER DEFAULT 0")
+                cursor.execute("UPDATE alert_rules SET evaluated=1")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_alert_rules_item ON alert_rules (realm_id, item_id, metric)")
+            # Per (realm, item) values the alert engine carries between runs: last metric values and previous stats
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS alert_state (
+                    realm_id INTEGER,
+                    item_id INTEGER,
+                    key TEXT,
+                    value REAL,
+                    PRIMARY KEY (realm_id, item_id, key)
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS trades (
+                    trade_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp INTEGER,
+                    realm_id INTEGER,
+                    item_id INTEGER,
+                    qty INTEGER,
+                    price REAL,
+                    note TEXT
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_prices_realm_item ON prices (realm_id, item_id, timestamp)")
+            # Last snapshot per (realm, item, day); kept current by store_price for cheap long-range revaluation
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS daily_prices (
+                    day INTEGER,
+                    realm_id INTEGER,
+                    item_id INTEGER,
+                    timestamp INTEGER,
+                    avg_price REAL,
+                    PRIMARY KEY (realm_id, item_id, day)
+                )
+            """)
+            # snapshot_version is bumped by every price commit; the query service keys its cache on it
+            cursor.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+            cursor.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('snapshot_version', 0)")
+            if cursor.execute("SELECT 1 FROM daily_prices LIMIT 1").fetchone() is None:
+                cursor.execute("""
+                    INSERT OR IGNORE INTO daily_prices (day, realm_id, item_id, timestamp, avg_price)
+                    SELECT timestamp / 86400, realm_id, item_id, MAX(timestamp), avg_price
+                    FROM prices GROUP BY realm_id, item_id, timestamp / 86400
+                """)
             conn.commit()
         except sqlite3.Error as e:
             print(f"DB init error: {e}")
@@ -38,12 +99,43 @@ class Database:
                 INSERT OR REPLACE INTO prices (timestamp, realm_id, item_id, min_price, avg_price, max_price, volume)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             """, (timestamp, realm_id, item_id, stats.get('min', 0), stats.get('avg', 0), stats.get('max', 0), stats.get('volume', 0)))
+            cursor.execute("""
+                INSERT INTO daily_prices (day, realm_id, item_id, timestamp, avg_price)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (realm_id, item_id, day) DO UPDATE SET timestamp=excluded.timestamp, avg_price=excluded.avg_price
+                WHERE excluded.timestamp >= daily_prices.timestamp
+            """, (timestamp // 86400, realm_id, item_id, timestamp, stats.get('avg', 0)))
+            cursor.execute("UPDATE meta SET value = value + 1 WHERE key='snapshot_version'")
             conn.commit()
         except sqlite3.Error as e:
             print(f"DB store error: {e}")
         finally:
             if 'conn' in locals(): conn.close()
 
+    @staticmethod
+    def store_prices(rows: List[tuple]):
+        # Bulk store_price in one transaction; rows are (realm_id, item_id, stats, timestamp)
+        if not rows: return
+        try:
+            conn = sqlite3.connect(DB_FILE)
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT OR REPLACE INTO prices (timestamp, realm_id, item_id, min_price, avg_price, max_price, volume)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [(ts, rid, iid, s.get('min', 0), s.get('avg', 0), s.get('max', 0), s.get('volume', 0)) for rid, iid, s, ts in rows])
+            cursor.executemany("""
+                INSERT INTO daily_prices (day, realm_id, item_id, timestamp, avg_price)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (realm_id, item_id, day) DO UPDATE SET timestamp=excluded.timestamp, avg_price=excluded.avg_price
+                WHERE excluded.timestamp >= daily_prices.timestamp
+            """, [(ts // 86400, rid, iid, ts, s.get('avg', 0)) for rid, iid, s, ts in rows])
+            cursor.execute("UPDATE meta SET value = value + 1 WHERE key='snapshot_version'")
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"DB bulk store error: {e}")
+        finally:
+            if 'conn' in locals(): conn.close()
+
     @staticmethod
     def get_recent_price(item_id: int, realm_id: int, hours: int = 24) -> Optional[float]:
         try:
@@ -77,3 +169,203 @@ class Database:
             return pd.DataFrame()
         finally:
             if 'conn' in locals(): conn.close()
+
+    @staticmethod
+    def add_alert_rule(realm_id: int, item_id: int, metric: str, op: str, threshold: float, label: str = "") -> Optional[int]:
+        try:
+            conn = sqlite3.connect(DB_FILE)
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO alert_rules (realm_id, item_id, metric, op, threshold, label)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (realm_id, item_id, metric, op, threshold, label))
+            conn.commit()
+            return cursor.lastrowid
+        except sqlite3.Error as e:
+            print(f"DB alert rule error: {e}")
+            return None
+        finally:
+            if 'conn' in locals(): conn.close()
+
+    @staticmethod
+    def remove_alert_rule(rule_id: int):
+        try:
+            conn = sqlite3.connect(DB_FILE)
+            conn.execute("DELETE FROM alert_rules WHERE rule_id=?", (rule_id,))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"DB alert rule error: {e}")
+        finally:
+            if 'conn' in locals(): conn.close()
+
+    @staticmethod
+    def get_alert_rules(realm_id: Optional[int] = None) -> pd.DataFrame:
+        try:
+            conn = sqlite3.connect(DB_FILE)
+            query = "SELECT rule_id, realm_id, item_id, metric, op, threshold, label, evaluated FROM alert_rules WHERE enabled=1"
+            params = ()
+            if realm_id is not None:
+                query += " AND realm_id=?"
+                params = (realm_id,)
+            return pd.read_sql_query(query, conn, params=params)
+        except sqlite3.Error as e:
+            print(f"DB alert rules error: {e}")
+            return pd.DataFrame()
+        finally:
+            if 'conn' in locals(): conn.close()
+
+    @staticmethod
+    def mark_alert_rules_evaluated(rule_ids: List[int]):
+        if not rule_ids: return
+        try:
+            conn = sqlite3.connect(DB_FILE)
+            conn.executemany("UPDATE alert_rules SET evaluated=1 WHERE rule_id=?", [(int(r),) for r in rule_ids])
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"DB alert rule error: {e}")
+        finally:
+            if 'conn' in locals(): conn.close()
+
+    @staticmethod
+    def get_alert_state(realm_id: int, item_ids: List[int]) -> Dict:
+        # {(item_id, key): value} for the given items
+        if not item_ids: return {}
+        try:
+            conn = sqlite3.connect(DB_FILE)
+            rows = conn.execute(
+                f"SELECT item_id, key, value FROM alert_state WHERE realm_id=? AND item_id IN ({','.join('?' * len(item_ids))})",
+                [realm_id] + [int(i) for i in item_ids]
+            ).fetchall()
+            return {(iid, key): value for iid, key, value in rows}
+        except sqlite3.Error as e:
+            print(f"DB alert state error: {e}")
+            return {}
+        finally:
+            if 'conn' in locals(): conn.close()
+
+    @staticmethod
+    def set_alert_state(realm_id: int, state: Dict):
+        # state is {(item_id, key): value}
+        if not state: return
+        try:
+            conn = sqlite3.connect(DB_FILE)
+            conn.executemany(
+                "INSERT OR REPLACE INTO alert_state (realm_id, item_id, key, value) VALUES (?, ?, ?, ?)",
+                [(realm_id, int(iid), key, float(value)) for (iid, key), value in state.items()]
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"DB alert state error: {e}")
+        finally:
+            if 'conn' in locals(): conn.close()
+
+    @staticmethod
+    def record_trade(realm_id: int, item_id: int, qty: int, price: float, timestamp: Optional[int] = None, note: str = "") -> Optional[int]:
+        # qty > 0 is a buy, qty < 0 a sell; price is gold per unit
+        try:
+            conn = sqlite3.connect(DB_FILE)
+            timestamp = timestamp or int(datetime.now().timestamp())
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO trades (timestamp, realm_id, item_id, qty, price, note)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (timestamp, realm_id, item_id, qty, price, note))
+            conn.commit()
+            return cursor.lastrowid
+        except sqlite3.Error as e:
+            print(f"DB trade error: {e}")
+            return None
+        finally:
+            if 'conn' in locals(): conn.close()
+
+    @staticmethod
+    def get_trades(realm_id: Optional[int] = None) -> pd.DataFrame:
+        try:
+            conn = sqlite3.connect(DB_FILE)
+            query = "SELECT trade_id, timestamp, realm_id, item_id, qty, price, note FROM trades"
+            params = ()
+            if realm_id is not None:
+                query += " WHERE realm_id=?"
+                params = (realm_id,)
+            return pd.read_sql_query(query + " ORDER BY timestamp, trade_id", conn, params=params)
+        except sqlite3.Error as e:
+            print(f"DB trades error: {e}")
+            return pd.DataFrame()
+        finally:
+            if 'conn' in locals(): conn.close()
+
+    @staticmethod
+    def get_price_panel(realm_id: Optional[int] = None, item_ids: Optional[List[int]] = None, days: int = 7, daily: bool = False, since: Optional[int] = None) -> pd.DataFrame:
+        # Long-format history for many items in one query: timestamp, realm_id, item_id, avg_price.
+        # daily=True reads the daily_prices rollup (last snapshot per day) instead of every snapshot;
+        # since overrides days with an exclusive timestamp lower bound.
+        try:
+            conn = sqlite3.connect(DB_FILE)
+            cutoff = since if since is not None else int((datetime.now() - timedelta(days=days)).timestamp())
+            table = "daily_prices" if daily else "prices"
+            query = f"SELECT timestamp, realm_id, item_id, avg_price FROM {table} WHERE timestamp > ?"
+            params = [cutoff]
+            if realm_id is not None:
+                query += " AND realm_id=?"
+                params.append(realm_id)
+            if item_ids:
+                query += f" AND item_id IN ({','.join('?' * len(item_ids))})"
+                params.extend(int(i) for i in item_ids)
+            return pd.read_sql_query(query + " ORDER BY timestamp", conn, params=params)
+        except sqlite3.Error as e:
+            print(f"DB price panel error: {e}")
+            return pd.DataFrame()
+        finally:
+            if 'conn' in locals(): conn.close()
+
+    @staticmethod
+    def get_latest_prices(realm_id: Optional[int] = None, item_ids: Optional[List[int]] = None) -> pd.DataFrame:
+        # Most recent avg_price per (realm, item), read from the daily rollup whose newest row is the latest snapshot
+        try:
+            conn = sqlite3.connect(DB_FILE)
+            query = "SELECT realm_id, item_id, MAX(timestamp) AS timestamp, avg_price FROM daily_prices WHERE 1=1"
+            params = []
+            if realm_id is not None:
+                query += " AND realm_id=?"
+                params.append(realm_id)
+            if item_ids:
+                query += f" AND item_id IN ({','.join('?' * len(item_ids))})"
+                params.extend(int(i) for i in item_ids)
+            return pd.read_sql_query(query + " GROUP BY realm_id, item_id", conn, params=params)
+        except sqlite3.Error as e:
+            print(f"DB latest prices error: {e}")
+            return pd.DataFrame()
+        finally:
+            if 'conn' in locals(): conn.close()
+
+    @staticmethod
+    def get_snapshot_version() -> int:
+        # Counter bumped by every store_price/store_prices commit, so partial ingests are visible too
+        try:
+            conn = sqlite3.connect(DB_FILE)
+            row = conn.execute("SELECT value FROM meta WHERE key='snapshot_version'").fetchone()
+            return int(row[0]) if row and row[0] is not None else 0
+        except sqlite3.Error as e:
+            print(f"DB version error: {e}")
+            return 0
+        finally:
+            if 'conn' in locals(): conn.close()
+
+    @staticmethod
+    def get_latest_snapshot(realm_id: int, item_ids: Optional[List[int]] = None) -> pd.DataFrame:
+        try:
+            conn = sqlite3.connect(DB_FILE)
+            query = """
+                SELECT item_id, timestamp, min_price, avg_price, max_price, volume FROM prices
+                WHERE realm_id=? AND timestamp=(SELECT MAX(timestamp) FROM prices WHERE realm_id=?)
+            """
+            params = [realm_id, realm_id]
+            if item_ids:
+                query += f" AND item_id IN ({','.join('?' * len(item_ids))})"
+                params.extend(int(i) for i in item_ids)
+            return pd.read_sql_query(query + " ORDER BY item_id", conn, params=params)
+        except sqlite3.Error as e:
+            print(f"DB snapshot error: {e}")
+            return pd.DataFrame()
+        finally:
+            if 'conn' in locals(): conn.close()
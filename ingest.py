@@ -0,0 +1,90 @@
+# wow_terminal/ingest.py (Parse/aggregate auction dumps across a process pool, single DB writer)
+import os
+import json
+import pandas as pd
+from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from typing import Dict, Iterable, List, Optional, Tuple
+from .database import Database
+
+def aggregate_dump(raw: bytes, item_ids: Optional[List[int]] = None) -> Tuple[Optional[int], Dict[int, Dict]]:
+    """Decode one auctions dump and reduce it to AuctionAnalyzer-style stats for every item in one pass."""
+    data = json.loads(raw)
+    wanted = set(item_ids) if item_ids else None
+    ids, prices, qtys, listed = [], [], [], []
+    for auc in data.get("auctions", []):
+        try:
+            iid = auc["item"]["id"]
+            if wanted is not None and iid not in wanted: continue
+            listed.append(iid)
+            price = auc.get("buyout") or auc.get("unit_price")
+            qty = auc["quantity"]
+            if price and qty:
+                ids.append(iid)
+                prices.append(price / qty)
+                qtys.append(qty)
+        except KeyError:
+            continue
+    if not ids: return data.get("lastModified"), {}
+    df = pd.DataFrame({"item_id": ids, "price": prices, "qty": qtys})
+    agg = df.groupby("item_id").agg(min=("price", "min"), avg=("price", "mean"), max=("price", "max"), volume=("qty", "sum"))
+    agg[["min", "avg", "max"]] /= 10000
+    agg["listings"] = pd.Series(listed).value_counts()
+    # Plain Python types so results pickle small and bind directly in sqlite3
+    stats = {
+        int(iid): {"min": float(r.min), "avg": float(r.avg), "max": float(r.max), "volume": int(r.volume), "listings": int(r.listings)}
+        for iid, r in zip(agg.index, agg.itertuples(index=False))
+    }
+    return data.get("lastModified"), stats
+
+def _ingest_worker(task: Tuple[int, bytes, Optional[List[int]]]) -> Tuple[int, Optional[int], Dict[int, Dict]]:
+    realm_id, raw, item_ids = task
+    last_modified, stats = aggregate_dump(raw, item_ids)
+    return realm_id, last_modified, stats
+
+def ingest_dumps(dumps: Iterable[Tuple[int, bytes]], item_ids: Optional[List[int]] = None, timestamp: Optional[int] = None,
+                 workers: Optional[int] = None, batch_size: int = 5000, alert_engine=None) -> Dict[int, Dict[int, Dict]]:
+    """Fan raw (realm_id, dump bytes) pairs out to worker processes and commit their per-item stats.
+
+    dumps may be a generator (e.g. one that downloads as it goes): each dump is submitted as soon as it
+    is yielded and at most 2 x workers are held in flight, so parsing overlaps downloads. Only the compact
+    stats come back from the workers; this process is the single writer. Commits always hold whole realms,
+    flushed once at least batch_size rows are pending, so no realm's snapshot is ever half-visible.
+    Returns {realm_id: {item_id: stats}}.
+    """
+    timestamp = timestamp or int(datetime.now().timestamp())
+    workers = workers or os.cpu_count() or 1
+    results, pending = {}, []
+
+    def collect(done):
+        nonlocal pending
+        for future in done:
+            realm_id = in_flight.pop(future)
+            try:
+                _, last_modified, stats = future.result()
+            except Exception as e:
+                print(f"Ingest worker error for realm {realm_id}: {e}")
+                continue
+            if last_modified:
+                print(f"Realm {realm_id} last modified: {datetime.fromtimestamp(last_modified / 1000)}")
+            results[realm_id] = stats
+            # A realm's rows are added together and only flushed after, so batches end on realm boundaries
+            pending.extend((realm_id, iid, s, timestamp) for iid, s in stats.items())
+            if len(pending) >= batch_size:
+                Database.store_prices(pending)
+                pending = []
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = {}  # future -> realm_id
+        for realm_id, raw in dumps:
+            in_flight[pool.submit(_ingest_worker, (realm_id, raw, item_ids))] = realm_id
+            del raw  # The pool holds its own copy; don't keep every dump alive here
+            done, _ = wait(in_flight, timeout=0 if len(in_flight) < 2 * workers else None, return_when=FIRST_COMPLETED)
+            collect(done)
+        collect(as_completed(list(in_flight)))
+    Database.store_prices(pending)
+    # After the last commit, so history-based rules (RSI) see this snapshot
+    if alert_engine is not None:
+        for realm_id, stats in results.items():
+            alert_engine.evaluate(realm_id, stats, timestamp)
+    return results
@@ -1,9 +1,11 @@
+import json
 import pandas as pd
 from datetime import datetime
 from .api import BlizzardAPI
 from .database import Database
-from .analyzer import AuctionAnalyzer
 from .calculator import Recipe, CraftingCalculator, print_crafting_flow, format_gold
+from .alerts import AlertEngine
+from .ingest import ingest_dumps
 
 def main():
     client_id = "YOUR_CLIENT_ID"  # Replace
@@ -11,6 +13,7 @@ def main():
 
     Database.init_db()
     api = BlizzardAPI(client_id, client_secret)
+    alert_engine = AlertEngine()
 
     # Popular US Classic Era realms (PvP/PvE mix)
     realm_names = ["whitemane", "mankrik", "atiesh"]
@@ -35,21 +38,28 @@ def main():
     results = []
     auctions_data = None  # Use last fetched for calc
 
-    for realm_name, realm_id in realm_ids.items():
-        print(f"\nFetching auctions for {realm_name} (ID: {realm_id})...")
-        try:
-            auctions_data = api.get_auctions(realm_id)
-            print(f"Last modified: {datetime.fromtimestamp(auctions_data['lastModified']/1000)}")
-        except Exception as e:
-            print(f"Error: {e}")
-            continue
+    old_prices = {}
+    crafting_dump = {}  # Only the last realm's raw dump is kept, for the crafting example
+
+    def download():
+        for realm_name, realm_id in realm_ids.items():
+            print(f"\nFetching auctions for {realm_name} (ID: {realm_id})...")
+            for item_id in items:
+                old_prices[(realm_id, item_id)] = Database.get_recent_price(item_id, realm_id)
+            raw = api.get_auctions_raw(realm_id)
+            crafting_dump['raw'] = raw
+            yield realm_id, raw
+
+    # Each dump goes to a worker process as soon as it is downloaded; this process only writes
+    snapshots = ingest_dumps(download(), timestamp=timestamp, alert_engine=alert_engine)
 
+    for realm_name, realm_id in realm_ids.items():
+        snapshot = snapshots.get(realm_id, {})
         for item_id, item_name in items.items():
-            stats = AuctionAnalyzer.analyze_item(auctions_data, item_id)
+            stats = snapshot.get(item_id)
             if stats:
-                old_price = Database.get_recent_price(item_id, realm_id)
+                old_price = old_prices.get((realm_id, item_id))
                 change = ((stats['avg'] - old_price) / old_price * 100) if old_price else 0
-                Database.store_price(realm_id, item_id, stats, timestamp)
 
                 results.append({
                     'Realm': realm_name,
@@ -64,23 +74,25 @@ def main():
             else:
                 print(f"No auctions for {item_name}")
 
+    if crafting_dump:
+        auctions_data = json.loads(crafting_dump.pop('raw'))
+
     if results:
         df = pd.DataFrame(results)
         print("\n=== CURRENT MARKET SUMMARY ===")
         print(df.to_string(index=False))
 
-    from .quant import volatility, moving_averages, correlation
-
-# Example
-thorium_id = 10620
-print(f"Thorium Ore Volatility (annualized): {volatility(thorium_id, sample_realm):.2f}")
-ma_df = moving_averages(thorium_id, sample_realm)
-print(ma_df.tail())
+    from .quant import volatility, top_correlated
 
     # Example history for first item/realm
     if realm_ids:
         sample_item = 10620
         sample_realm = list(realm_ids.values())[0]
+        print(f"Thorium Ore Volatility (annualized): {volatility(sample_item, sample_realm):.2f}")
+        neighbours = top_correlated(sample_item, sample_realm, k=5)
+        if not neighbours.empty:
+            print("\n=== MOST CORRELATED WITH THORIUM ORE ===")
+            print(neighbours.to_string(index=False))
         hist = Database.get_price_history(sample_item, sample_realm)
         if not hist.empty:
             print(f"\n=== 7-DAY HISTORY: {list(items.values())[0]} on {list(realm_ids.keys())[0]} ===")
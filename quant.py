@@ -2,10 +2,11 @@
 import pandas as pd
 import numpy as np
 import json
+import threading
 from .database import Database
 from .analyzer import AuctionAnalyzer
 from .api import BlizzardAPI
-from .calculator import CraftingCalculator, Recipe
+from .calculator import CraftingCalculator, Recipe, format_gold
 
 # Vendor prices (copper; expand from Wowhead)
 VENDOR_PRICES = {  # item_id: vendor_price_copper per unit
@@ -107,22 +108,22 @@ def sniping_opps(auctions_data, item_id, realm_id, threshold=0.9):
 # 2. Vendor Flips
 def vendor_flips(auctions_data, api):
     try:
-    flips = []
-    for auc in auctions_data.get('auctions', []):
-        iid = auc['item']['id']
-        if iid in VENDOR_PRICES and VENDOR_PRICES[iid] > 0:
-            unit_gold = (auc.get('buyout') or auc.get('unit_price', 0)) / auc['quantity'] / 10000
-            vendor_gold = VENDOR_PRICES[iid] / 10000
-            if unit_gold < vendor_gold:
-                name = api.get_item_details(iid)['name']
-                profit = (vendor_gold - unit_gold) * auc['quantity']
-                flips.append({
-                    'Item': name,
-                    'Buy': format_gold(unit_gold * auc['quantity']),
-                    'Vendor': format_gold(vendor_gold * auc['quantity']),
-                    'Profit': format_gold(profit)
-                })
-return flips
+        flips = []
+        for auc in auctions_data.get('auctions', []):
+            iid = auc['item']['id']
+            if iid in VENDOR_PRICES and VENDOR_PRICES[iid] > 0:
+                unit_gold = (auc.get('buyout') or auc.get('unit_price', 0)) / auc['quantity'] / 10000
+                vendor_gold = VENDOR_PRICES[iid] / 10000
+                if unit_gold < vendor_gold:
+                    name = api.get_item_details(iid)['name']
+                    profit = (vendor_gold - unit_gold) * auc['quantity']
+                    flips.append({
+                        'Item': name,
+                        'Buy': format_gold(unit_gold * auc['quantity']),
+                        'Vendor': format_gold(vendor_gold * auc['quantity']),
+                        'Profit': format_gold(profit)
+                    })
+        return flips
     except Exception as e:
         print(f"Flips error: {e}")
         return []
@@ -130,62 +131,62 @@ return flips
 # 3. Farms GPH
 def farm_gph(farm_key, get_unit_func):
     try:
-    if farm_key not in FARMS: return 0
-    farm = FARMS[farm_key]
-    mat_val = sum(get_unit_func(iid) * qty for iid, qty in farm['items'].items())
-    return farm['raw_gold'] + mat_val
+        if farm_key not in FARMS: return 0
+        farm = FARMS[farm_key]
+        mat_val = sum(get_unit_func(iid) * qty for iid, qty in farm['items'].items())
+        return farm['raw_gold'] + mat_val
     except Exception as e:
         print(f"Flips error: {e}")
         return []
 
 # 4. Arb (needs multi auctions)
 def realm_arb(item_id, realm_auctions):  # {realm: auctions_data}
-        try:
-    prices = {}
-    for realm, data in realm_auctions.items():
-        stats = AuctionAnalyzer.analyze_item(data, item_id)
-        if stats: prices[realm] = stats['avg']
-    if len(prices) < 2: return pd.DataFrame()
-    df = pd.DataFrame(list(prices.items()), columns=['Realm', 'Avg Gold'])
-    min_p = df['Avg Gold'].min()
-    df['Spread %'] = ((df['Avg Gold'] - min_p) / min_p * 100).round(1)
-    return df[df['Spread %'] > 15].sort_values('Spread %', ascending=False)
+    try:
+        prices = {}
+        for realm, data in realm_auctions.items():
+            stats = AuctionAnalyzer.analyze_item(data, item_id)
+            if stats: prices[realm] = stats['avg']
+        if len(prices) < 2: return pd.DataFrame()
+        df = pd.DataFrame(list(prices.items()), columns=['Realm', 'Avg Gold'])
+        min_p = df['Avg Gold'].min()
+        df['Spread %'] = ((df['Avg Gold'] - min_p) / min_p * 100).round(1)
+        return df[df['Spread %'] > 15].sort_values('Spread %', ascending=False)
     except Exception as e:
         print(f"Flips error: {e}")
         return []
 
 # 5. Posting
 def post_price(stats, vol):
-        try:
-    if vol > 0.2: return stats['min'] * 0.95
-    return stats['min'] * 0.99 - 0.0001  # Undercut
+    try:
+        if vol > 0.2: return stats['min'] * 0.95
+        return stats['min'] * 0.99 - 0.0001  # Undercut
     except Exception as e:
         print(f"Flips error: {e}")
         return []
 
 # 6. Demand
 def mat_demand(mat_id, auctions_data, api):
-        try:
-    demand_vol = 0
-    for rid in DEMAND_RECIPES.get(mat_id, []):
-        recipe = Recipe(rid, api)
-        if recipe.crafted_item_id:
-            stats = AuctionAnalyzer.analyze_item(auctions_data, recipe.crafted_item_id)
-            demand_vol += stats.get('volume', 0) if stats else 0
-    return demand_vol
+    try:
+        demand_vol = 0
+        for rid in DEMAND_RECIPES.get(mat_id, []):
+            recipe = Recipe(rid, api)
+            if recipe.crafted_item_id:
+                stats = AuctionAnalyzer.analyze_item(auctions_data, recipe.crafted_item_id)
+                demand_vol += stats.get('volume', 0) if stats else 0
+        return demand_vol
     except Exception as e:
         print(f"Flips error: {e}")
         return []
 
 # 7. Health
 def economy_health(auctions_data):
-        try:
-    listings = len(auctions_data.get('auctions', []))
-    return {
-        'Listings': listings,
-        'Vol Index': 50,  # Placeholder; avg RSI or vol
-        'Health': 'Stable' if listings > 10000 else 'Low Activity'
-    }
+    try:
+        listings = len(auctions_data.get('auctions', []))
+        return {
+            'Listings': listings,
+            'Vol Index': 50,  # Placeholder; avg RSI or vol
+            'Health': 'Stable' if listings > 10000 else 'Low Activity'
+        }
     except Exception as e:
         print(f"Flips error: {e}")
         return []
@@ -195,23 +196,247 @@ RECENT_NEWS = [{'title': 'TBC Prep: Stock Thorium!', 'impact': 'High'}]
 
 # 9. Backtest
 def backtest_strategy(item_id, realm_id, days=30):
-        try:
-    df = get_item_history(item_id, realm_id, days)
-    if len(df) < 2: return pd.DataFrame()
-    df['returns'] = df['price'].pct_change()
-    df['cum_ret'] = (1 + df['returns']).cumprod() - 1
-    return df[['datetime', 'price', 'cum_ret']].dropna()
+    try:
+        df = get_item_history(item_id, realm_id, days)
+        if len(df) < 2: return pd.DataFrame()
+        df['returns'] = df['price'].pct_change()
+        df['cum_ret'] = (1 + df['returns']).cumprod() - 1
+        return df[['datetime', 'price', 'cum_ret']].dropna()
     except Exception as e:
         print(f"Flips error: {e}")
         return []
 
 # 10. Portfolio
 def portfolio_value(positions, get_unit_func):
-        try:
-    if not positions: return {'cost': 0, 'current': 0, 'pnl': 0}
-    cost = sum(p.get('buy_price', 0) * p.get('qty', 0) for p in positions)
-    current = sum(get_unit_func(p['item_id']) * p['qty'] for p in positions)
-    return {'cost': cost, 'current': current, 'pnl': current - cost}
+    try:
+        if not positions: return {'cost': 0, 'current': 0, 'pnl': 0}
+        cost = sum(p.get('buy_price', 0) * p.get('qty', 0) for p in positions)
+        current = sum(get_unit_func(p['item_id']) * p['qty'] for p in positions)
+        return {'cost': cost, 'current': current, 'pnl': current - cost}
     except Exception as e:
         print(f"Flips error: {e}")
         return []
+
+def portfolio_positions(realm_id=None):
+    """Open qty, average cost, realized and unrealized P&L per (realm, item) from the trades ledger."""
+    try:
+        trades = Database.get_trades(realm_id)
+        if trades.empty: return pd.DataFrame()
+        rows = []
+        for (rid, iid), group in trades.groupby(['realm_id', 'item_id']):
+            pos, avg_cost, realized = 0, 0.0, 0.0
+            for qty, price in zip(group['qty'], group['price']):
+                if pos == 0 or (qty > 0) == (pos > 0):
+                    # Opening or adding to a position (long or short): blend the average cost
+                    avg_cost = (abs(pos) * avg_cost + abs(qty) * price) / (abs(pos) + abs(qty))
+                    pos += qty
+                    continue
+                # Reducing: only the closed units realize P&L; any excess opens the other side at this price
+                closed = min(abs(qty), abs(pos))
+                realized += closed * (price - avg_cost) * (1 if pos > 0 else -1)
+                flipped = abs(qty) > abs(pos)
+                pos += qty
+                if pos == 0: avg_cost = 0.0
+                elif flipped: avg_cost = price
+            rows.append({'realm_id': rid, 'item_id': iid, 'qty': pos, 'avg_cost': avg_cost, 'realized': realized})
+        df = pd.DataFrame(rows)
+        prices = Database.get_latest_prices(realm_id, df['item_id'].tolist())
+        if prices.empty: prices = pd.DataFrame(columns=['realm_id', 'item_id', 'avg_price'])
+        df = df.merge(prices[['realm_id', 'item_id', 'avg_price']].rename(columns={'avg_price': 'price'}), on=['realm_id', 'item_id'], how='left')
+        # Open positions without a stored price stay NaN rather than looking flat
+        df['unrealized'] = ((df['price'] - df['avg_cost']) * df['qty']).where(df['qty'] != 0, 0.0)
+        df['total'] = df['realized'] + df['unrealized']
+        return df
+    except Exception as e:
+        print(f"Positions error: {e}")
+        return pd.DataFrame()
+
+def portfolio_history(realm_id=None, days=90, daily=True):
+    """Mark-to-market value and P&L of the whole ledger, per day (or per snapshot with daily=False).
+
+    Only holdings with a known price at each point are valued (their invested gold included alongside);
+    `unpriced` counts the open positions left out, e.g. before an item's first stored price.
+    """
+    try:
+        trades = Database.get_trades(realm_id)
+        if trades.empty: return pd.DataFrame()
+        prices = Database.get_price_panel(realm_id, trades['item_id'].unique().tolist(), days, daily)
+        if prices.empty: return pd.DataFrame()
+        keys = ['realm_id', 'item_id']
+        # Price matrix: snapshot x (realm, item); gaps carry the last price, nothing is priced before its first snapshot
+        price_grid = prices.set_index(['timestamp'] + keys)['avg_price'].unstack(keys).ffill()
+        grid = price_grid.index
+
+        def held(values):
+            # Cumulative per-(realm, item) trade amounts as of each snapshot
+            per_trade = trades.assign(amount=values).pivot_table(index='timestamp', columns=keys, values='amount', aggfunc='sum').cumsum()
+            return per_trade.reindex(per_trade.index.union(grid)).ffill().reindex(grid).fillna(0)
+
+        qty = held(trades['qty'])
+        # Net gold put in (buys minus sell proceeds) per holding
+        invested = held(trades['qty'] * trades['price'])
+        cols = price_grid.columns.union(qty.columns)
+        price_grid = price_grid.reindex(columns=cols)
+        qty = qty.reindex(columns=cols, fill_value=0)
+        invested = invested.reindex(columns=cols, fill_value=0)
+        valued = price_grid.notna() | (qty == 0)
+        value = (qty * price_grid.fillna(0)).where(valued, 0).sum(axis=1)
+        df = pd.DataFrame({
+            'timestamp': grid,
+            'value': value.values,
+            'invested': invested.where(valued, 0).sum(axis=1).values,
+            'unpriced': (~valued).sum(axis=1).values
+        })
+        df['pnl'] = df['value'] - df['invested']
+        df['datetime'] = pd.to_datetime(df['timestamp'], unit='s')
+        return df
+    except Exception as e:
+        print(f"Portfolio history error: {e}")
+        return pd.DataFrame()
+
+# 11. Correlation
+class ReturnMatrix:
+    """Rolling covariance/correlation of snapshot returns across every tracked item on a realm.
+
+    Keeps the last `window` return rows plus their running sums, so new snapshots are folded in
+    without recomputing the N x N matrix from scratch.
+    """
+    def __init__(self, realm_id, window=168, days=30):
+        self.realm_id = realm_id
+        self.window = window
+        self.days = days
+        self.item_ids = []
+        self._index = {}
+        self.last_ts = None
+        self.last_prices = np.empty(0)
+        self.returns = np.empty((0, 0))
+        self.sums = np.empty(0)
+        self.cross = np.empty((0, 0))
+        self._updates = 0
+        self._cov = None
+        self._corr = None
+        self._lock = threading.RLock()  # Shared by UI sessions and query-service threads
+
+    def _grow(self, item_ids):
+        new = [iid for iid in item_ids if iid not in self._index]
+        if not new: return
+        n_new = len(new)
+        self.item_ids.extend(new)
+        self._index.update({iid: i for i, iid in enumerate(self.item_ids)})
+        self.last_prices = np.concatenate([self.last_prices, np.full(n_new, np.nan)])
+        self.returns = np.hstack([self.returns, np.zeros((len(self.returns), n_new))])
+        self.sums = np.concatenate([self.sums, np.zeros(n_new)])
+        self.cross = np.pad(self.cross, ((0, n_new), (0, n_new)))
+
+    def update(self):
+        """Fold in snapshots newer than the last one seen; returns True if anything changed."""
+        with self._lock:
+            panel = Database.get_price_panel(self.realm_id, days=self.days, since=self.last_ts)
+            if panel.empty: return False
+            grid = panel.set_index(['timestamp', 'item_id'])['avg_price'].unstack('item_id')
+            self._grow([int(c) for c in grid.columns])
+            prices = grid.reindex(columns=self.item_ids).to_numpy(dtype=float)
+            if self.last_ts is not None:
+                prices = np.vstack([self.last_prices, prices])
+            # Carry each item's last known price through snapshots where it had no listings
+            prices = pd.DataFrame(prices).ffill().to_numpy()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rets = prices[1:] / prices[:-1] - 1
+            rets = np.nan_to_num(rets, nan=0.0, posinf=0.0, neginf=0.0)
+            self.last_prices = prices[-1]
+            self.last_ts = int(grid.index[-1])
+            self.returns = np.vstack([self.returns, rets])
+            self.sums += rets.sum(axis=0)
+            self.cross += rets.T @ rets
+            dropped = self.returns[:-self.window]
+            if len(dropped):
+                self.sums -= dropped.sum(axis=0)
+                self.cross -= dropped.T @ dropped
+                self.returns = self.returns[-self.window:]
+            self._updates += len(rets)
+            if self._updates >= self.window:  # Resum occasionally so add/subtract drift can't build up
+                self.sums = self.returns.sum(axis=0)
+                self.cross = self.returns.T @ self.returns
+                self._updates = 0
+            self._cov = None
+            self._corr = None
+            return True
+
+    def covariance(self):
+        with self._lock:
+            if self._cov is None:
+                n = len(self.returns)
+                if n < 2: return pd.DataFrame()
+                cov = (self.cross - np.outer(self.sums, self.sums) / n) / (n - 1)
+                self._cov = pd.DataFrame(cov, index=self.item_ids, columns=self.item_ids)
+            return self._cov
+
+    def correlation(self):
+        with self._lock:
+            if self._corr is None:
+                cov = self.covariance()
+                if cov.empty: return cov
+                std = np.sqrt(np.clip(np.diag(cov.values), 0, None))
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    corr = cov.values / np.outer(std, std)
+                corr[~np.isfinite(corr)] = np.nan
+                self._corr = pd.DataFrame(corr, index=self.item_ids, columns=self.item_ids)
+            return self._corr
+
+    def top_k(self, item_id, k=5):
+        """Items most correlated with item_id, from its row of the running sums alone (O(N), no N x N build)."""
+        if k < 1: return pd.DataFrame()
+        with self._lock:
+            n = len(self.returns)
+            i = self._index.get(item_id)
+            if n < 2 or i is None: return pd.DataFrame()
+            var = (np.diagonal(self.cross) - self.sums ** 2 / n) / (n - 1)
+            cov = (self.cross[i] - self.sums[i] * self.sums / n) / (n - 1)
+            ids = np.asarray(self.item_ids)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vals = cov / np.sqrt(np.clip(var[i], 0, None) * np.clip(var, 0, None))
+        keep = np.isfinite(vals)
+        keep[i] = False
+        vals, ids = vals[keep], ids[keep]
+        if not len(vals): return pd.DataFrame()
+        k = min(k, len(vals))
+        idx = np.argpartition(-vals, k - 1)[:k]
+        idx = idx[np.argsort(-vals[idx])]
+        return pd.DataFrame({'item_id': ids[idx], 'corr': vals[idx]})
+
+CORRELATION_WINDOWS = (24, 72, 168, 336, 720)  # Snapshots; each cached window holds an N x N matrix per realm
+_RETURN_MATRICES = {}  # (realm_id, window) -> ReturnMatrix
+_RETURN_MATRICES_LOCK = threading.Lock()
+
+def return_matrix(realm_id, window=168):
+    """Cached ReturnMatrix for (realm, window), brought up to date with any new snapshots."""
+    if window not in CORRELATION_WINDOWS:
+        raise ValueError(f"Unsupported correlation window {window}; use one of {CORRELATION_WINDOWS}")
+    key = (realm_id, window)
+    with _RETURN_MATRICES_LOCK:
+        if key not in _RETURN_MATRICES:
+            _RETURN_MATRICES[key] = ReturnMatrix(realm_id, window)
+        matrix = _RETURN_MATRICES[key]
+    matrix.update()
+    return matrix
+
+def correlation(realm_id, window=168):
+    try:
+        return return_matrix(realm_id, window).correlation()
+    except Exception as e:
+        print(f"Correlation error: {e}")
+        return pd.DataFrame()
+
+def covariance(realm_id, window=168):
+    try:
+        return return_matrix(realm_id, window).covariance()
+    except Exception as e:
+        print(f"Covariance error: {e}")
+        return pd.DataFrame()
+
+def top_correlated(item_id, realm_id, k=5, window=168):
+    try:
+        return return_matrix(realm_id, window).top_k(item_id, k)
+    except Exception as e:
+        print(f"Top correlated error: {e}")
+        return pd.DataFrame()
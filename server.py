@@ -0,0 +1,222 @@
+# wow_terminal/server.py (Read-only local HTTP/JSON query service over Database + latest snapshots)
+import json
+import math
+import hashlib
+import threading
+import requests
+import numpy as np
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from typing import Dict, Optional
+from .database import Database
+from .quant import rsi, volatility, backtest_strategy, top_correlated, CORRELATION_WINDOWS
+
+DEFAULT_PORT = 8765
+MAX_PER_PAGE = 1000
+
+def _records(df: pd.DataFrame) -> list:
+    if df is None or df.empty: return []
+    df = df.drop(columns=['datetime'], errors='ignore')
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+def _clean(o):
+    # Plain JSON types only; NaN/inf (np.float64 included, it subclasses float) become null
+    if isinstance(o, dict): return {k: _clean(v) for k, v in o.items()}
+    if isinstance(o, (list, tuple)): return [_clean(v) for v in o]
+    if isinstance(o, (float, np.floating)): return float(o) if math.isfinite(o) else None
+    if isinstance(o, np.integer): return int(o)
+    return o
+
+class QueryCache:
+    """Endpoint results shared by every client, dropped as soon as a newer snapshot is stored."""
+    def __init__(self):
+        self.version = None
+        self.entries = {}  # key -> payload
+        self.lock = threading.Lock()
+        self.key_locks = {}
+
+    def get(self, key, version: int, compute):
+        with self.lock:
+            if self.version is None or version > self.version:
+                self.version = version
+                self.entries = {}
+                self.key_locks = {}
+            stale = version < self.version
+            if not stale:
+                if key in self.entries: return self.entries[key]
+                key_lock = self.key_locks.setdefault(key, threading.Lock())
+        if stale:  # Read the version before a newer commit landed: answer it, but never roll the cache back
+            return compute()
+        with key_lock:  # Concurrent requests for the same key compute it once
+            with self.lock:
+                if self.version == version and key in self.entries: return self.entries[key]
+            payload = compute()
+            with self.lock:
+                if self.version == version: self.entries[key] = payload
+            return payload
+
+# Endpoint computations: each returns a list (paginated) or a dict
+def _stats(realm_id: int, item_ids: Optional[tuple] = None, **_):
+    snap = Database.get_latest_snapshot(realm_id, list(item_ids) if item_ids else None)
+    if snap.empty: return []
+    # % change of avg price vs the oldest snapshot in the last 24h
+    day = Database.get_price_panel(realm_id, snap['item_id'].tolist(), days=1)
+    if not day.empty:
+        first = day.groupby('item_id')['avg_price'].first().rename('day_open')
+        snap = snap.join(first, on='item_id')
+        snap['change_24h_pct'] = (snap['avg_price'] - snap['day_open']) / snap['day_open'] * 100
+        snap = snap.drop(columns='day_open')
+    return _records(snap)
+
+def _history(realm_id: int, item_id: int, days: int = 7, **_):
+    return _records(Database.get_price_history(item_id, realm_id, days))
+
+def _indicators(realm_id: int, item_id: int, days: int = 30, **_):
+    rsi_value, rsi_df = rsi(item_id, realm_id, days=days)
+    rsi_series = [{'timestamp': int(ts.timestamp()), 'rsi': v} for ts, v in zip(rsi_df.get('datetime', []), rsi_df.get('rsi', []))]
+    return {'item_id': item_id, 'rsi': rsi_value, 'rsi_series': rsi_series, 'volatility': volatility(item_id, realm_id, days)}
+
+def _backtest(realm_id: int, item_id: int, days: int = 30, **_):
+    df = backtest_strategy(item_id, realm_id, days)
+    if isinstance(df, pd.DataFrame) and not df.empty:
+        df = df.assign(timestamp=df['datetime'].astype('datetime64[s]').astype('int64'))
+    return _records(df) if isinstance(df, pd.DataFrame) else []
+
+def _opportunities(realm_id: int, item_id: Optional[int] = None, threshold: float = 0.9, days: int = 7, **_):
+    # Items whose current min buyout sits below threshold x their average over the window
+    snap = Database.get_latest_snapshot(realm_id)
+    if item_id is not None: snap = snap[snap['item_id'] == item_id] if not snap.empty else snap
+    if snap.empty: return []
+    hist = Database.get_price_panel(realm_id, snap['item_id'].tolist(), days)
+    if hist.empty: return []
+    mean = hist.groupby('item_id')['avg_price'].mean().rename('hist_avg')
+    df = snap.join(mean, on='item_id')
+    df = df[df['min_price'] < df['hist_avg'] * threshold].copy()
+    df['discount_pct'] = (1 - df['min_price'] / df['hist_avg']) * 100
+    return _records(df.sort_values('discount_pct', ascending=False)[['item_id', 'min_price', 'hist_avg', 'discount_pct', 'volume']])
+
+def _correlated(realm_id: int, item_id: int, k: int = 10, window: int = 168, **_):
+    return _records(top_correlated(item_id, realm_id, k, window))
+
+ENDPOINTS = {
+    '/stats': (_stats, ('realm',)),
+    '/history': (_history, ('realm', 'item')),
+    '/indicators': (_indicators, ('realm', 'item')),
+    '/opportunities': (_opportunities, ('realm',)),
+    '/backtest': (_backtest, ('realm', 'item')),
+    '/correlated': (_correlated, ('realm', 'item')),
+}
+MAX_ITEMS = 100
+
+def _int_list(value: str) -> tuple:
+    # "10620,13463" -> (10620, 13463); sorted so equal sets share a cache key
+    ids = tuple(sorted({int(v) for v in value.split(',') if v.strip()}))
+    if not ids or len(ids) > MAX_ITEMS or min(ids) < 1:
+        raise ValueError(f"items must be 1-{MAX_ITEMS} positive ids")
+    return ids
+
+PARAM_TYPES = {'realm': int, 'item': int, 'items': _int_list, 'days': int, 'k': int, 'window': int, 'threshold': float}
+PARAM_RANGES = {'realm': (1, None), 'item': (1, None), 'days': (1, 365), 'k': (1, 100), 'threshold': (0.01, 1.0)}
+PARAM_NAMES = {'realm': 'realm_id', 'item': 'item_id', 'items': 'item_ids'}
+
+class QueryHandler(BaseHTTPRequestHandler):
+    cache = QueryCache()
+
+    def _send(self, status: int, body: bytes = b'', etag: Optional[str] = None):
+        self.send_response(status)
+        if etag: self.send_header('ETag', etag)
+        if body:
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body: self.wfile.write(body)
+
+    def _error(self, status: int, message: str):
+        self._send(status, json.dumps({'error': message}).encode())
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path not in ENDPOINTS: return self._error(404, f"Unknown endpoint {url.path}")
+        func, required = ENDPOINTS[url.path]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            params = {PARAM_NAMES.get(k, k): PARAM_TYPES[k](v) for k, v in query.items() if k in PARAM_TYPES}
+            page = max(int(query.get('page', 1)), 1)
+            per_page = min(max(int(query.get('per_page', 100)), 1), MAX_PER_PAGE)
+        except ValueError as e:
+            return self._error(400, f"Bad parameter: {e}")
+        for name, (lo, hi) in PARAM_RANGES.items():
+            value = params.get(PARAM_NAMES.get(name, name))
+            if value is not None and (value < lo or (hi is not None and value > hi) or value != value):
+                return self._error(400, f"{name} must be between {lo} and {hi if hi is not None else 'any'}")
+        if 'window' in params and params['window'] not in CORRELATION_WINDOWS:
+            return self._error(400, f"window must be one of {', '.join(map(str, CORRELATION_WINDOWS))}")
+        missing = [r for r in required if PARAM_NAMES.get(r, r) not in params]
+        if missing: return self._error(400, f"Missing parameter(s): {', '.join(missing)}")
+
+        version = Database.get_snapshot_version()
+        key = (url.path, tuple(sorted(params.items())))
+        try:
+            data = self.cache.get(key, version, lambda: func(**params))
+        except Exception as e:
+            print(f"Query error for {self.path}: {e}")
+            return self._error(500, str(e))
+        if isinstance(data, list):
+            start = (page - 1) * per_page
+            payload = {'version': version, 'page': page, 'per_page': per_page, 'total': len(data), 'items': data[start:start + per_page]}
+        else:
+            payload = {'version': version, 'data': data}
+        body = json.dumps(_clean(payload), allow_nan=False).encode()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if etag in [t.strip() for t in self.headers.get('If-None-Match', '').split(',')]:
+            return self._send(304, etag=etag)
+        self._send(200, body, etag)
+
+    def log_message(self, format, *args):
+        pass  # Keep the console for ingestion/alert output
+
+def serve(host: str = '127.0.0.1', port: int = DEFAULT_PORT):
+    Database.init_db()
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    print(f"Query service on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+class QueryClient:
+    """Thin client for the query service; revalidates with ETags so unchanged results aren't resent."""
+    def __init__(self, base_url: str = f'http://127.0.0.1:{DEFAULT_PORT}', timeout: float = 10.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self._etags = {}  # url -> (etag, payload)
+
+    def get(self, endpoint: str, **params) -> Dict:
+        try:
+            url = requests.Request('GET', f"{self.base_url}/{endpoint.lstrip('/')}", params=params).prepare().url
+            cached = self._etags.get(url)
+            headers = {'If-None-Match': cached[0]} if cached else {}
+            response = requests.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and cached: return cached[1]
+            response.raise_for_status()
+            payload = response.json()
+            if response.headers.get('ETag'): self._etags[url] = (response.headers['ETag'], payload)
+            return payload
+        except requests.exceptions.RequestException as e:
+            print(f"Query service error for {endpoint}: {e}")
+            return {}
+
+    def get_all(self, endpoint: str, per_page: int = MAX_PER_PAGE, **params) -> pd.DataFrame:
+        rows, page = [], 1
+        while True:
+            payload = self.get(endpoint, page=page, per_page=per_page, **params)
+            rows.extend(payload.get('items', []))
+            if not payload or page * per_page >= payload.get('total', 0): break
+            page += 1
+        return pd.DataFrame(rows)
+
+if __name__ == "__main__":
+    serve()
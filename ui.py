@@ -7,6 +7,7 @@ from .database import Database
 from .analyzer import AuctionAnalyzer
 from .calculator import Recipe, CraftingCalculator, format_gold
 from .quant import *
+from .server import QueryClient
 
 st.markdown("""
 <style>
@@ -25,6 +26,15 @@ def fetch_multi_auctions(api, realms):
         if rid: data[r] = api.get_auctions(rid)
     return data
 
+# Shared across sessions, so a new user doesn't add Blizzard lookups
+@st.cache_data(ttl=86400)
+def resolve_realm_id(client_id, client_secret, realm):
+    return BlizzardAPI(client_id, client_secret).get_connected_realm_id(realm)
+
+@st.cache_data(ttl=86400)
+def item_name(client_id, client_secret, iid):
+    return BlizzardAPI(client_id, client_secret).get_item_details(iid)['name']
+
 def main_ui():
     st.title("WoW Classic Economy Terminal")
     # Sidebar (old + new options)
@@ -35,32 +45,51 @@ def main_ui():
     item_id = st.sidebar.selectbox("Item ID", [10620, 13463, 12360])
     recipe_id = st.sidebar.number_input("Recipe ID", 17187)
     craft_qty = st.sidebar.number_input("Craft Qty", 5)
+    service_url = st.sidebar.text_input("Query Service URL (blank = local)", "")
+    api = BlizzardAPI(client_id, client_secret)
+    realm_cr = resolve_realm_id(client_id, client_secret, realm)
     if st.sidebar.button("Refresh"):
-        st.session_state.auctions = api.get_auctions(api.get_connected_realm_id(realm))
+        st.session_state.auctions = api.get_auctions(realm_cr)
         st.session_state.multi_auctions = fetch_multi_auctions(api, ["whitemane", "mankrik", "atiesh"])
         st.rerun()
 
-    api = BlizzardAPI(client_id, client_secret)
+    # With a query service the market tabs read shared, precomputed results and need no auction dump
+    client = None
+    if service_url:
+        if getattr(st.session_state.get('query_client'), 'base_url', None) != service_url.rstrip('/'):
+            st.session_state.query_client = QueryClient(service_url)  # Kept across reruns for ETag revalidation
+        client = st.session_state.query_client
     Database.init_db()
     auctions = st.session_state.get('auctions')
     multi_auctions = st.session_state.get('multi_auctions', {})
 
-    if not auctions: return
+    if not auctions and not client: return
+    needs_dump = "Refresh to load this realm's auctions."
 
     # Tabs (old market/chart in first, new in others)
-    tabs = st.tabs(["Market & Chart", "Sniping", "Vendor Flips", "Farms", "Arb", "Posting", "Demand", "Health", "News", "Backtest", "Portfolio"])
+    tabs = st.tabs(["Market & Chart", "Sniping", "Vendor Flips", "Farms", "Arb", "Posting", "Demand", "Health", "News", "Backtest", "Portfolio", "Correlation"])
 
     with tabs[0]:
         # Old Market Summary
         results = []
-        for iid in [10620, 13463, 12360]:
-            stats = AuctionAnalyzer.analyze_item(auctions, iid)
-            if stats:
-                old_p = Database.get_recent_price(iid, api.get_connected_realm_id(realm))
+        summary_ids = [10620, 13463, 12360]
+        if client:
+            # Only the summarised items (plus the sidebar item, for Posting), not the realm's whole snapshot
+            wanted = sorted(set(summary_ids) | {item_id})
+            served = {r['item_id']: r for r in client.get('stats', realm=realm_cr, items=','.join(map(str, wanted))).get('items', [])}
+        for iid in summary_ids:
+            if client:
+                row = served.get(iid)
+                stats = {'min': row['min_price'], 'avg': row['avg_price'], 'max': row['max_price'], 'volume': row['volume']} if row else None
+                change = (row.get('change_24h_pct') or 0) if row else 0
+            else:
+                stats = AuctionAnalyzer.analyze_item(auctions, iid)
+                old_p = Database.get_recent_price(iid, realm_cr) if stats else None
                 change = ((stats['avg'] - old_p) / old_p * 100) if old_p else 0
+            if stats:
                 change_class = "positive" if change > 0 else "negative"
                 results.append({
-                    'Item': api.get_item_details(iid)['name'],
+                    'Item': item_name(client_id, client_secret, iid),
                     'Min': format_gold(stats['min']),
                     'Avg': format_gold(stats['avg']),
                     'Max': format_gold(stats['max']),
@@ -70,76 +99,122 @@ def main_ui():
         if results: st.markdown(pd.DataFrame(results).to_html(escape=False), unsafe_allow_html=True)
 
         # Old Chart with RSI
-        hist = get_item_history(item_id, api.get_connected_realm_id(realm))
+        if client:
+            hist = client.get_all('history', realm=realm_cr, item=item_id, days=30)
+            if not hist.empty:
+                hist['datetime'] = pd.to_datetime(hist['timestamp'], unit='s')
+                hist['price'] = hist['avg_price'] / 10000
+            indicators = client.get('indicators', realm=realm_cr, item=item_id).get('data', {})
+            rsi_df = pd.DataFrame(indicators.get('rsi_series', []))
+            if not rsi_df.empty: rsi_df['datetime'] = pd.to_datetime(rsi_df['timestamp'], unit='s')
+        else:
+            hist = get_item_history(item_id, realm_cr)
+            _, rsi_df = rsi(item_id, realm_cr)
         if not hist.empty:
             fig, ax1 = plt.subplots()
             ax1.plot(hist['datetime'], hist['price'], 'lime')
             ax1.set_ylabel('Gold', color='lime')
-            _, rsi_df = rsi(item_id, api.get_connected_realm_id(realm))
             if not rsi_df.empty:
                 ax2 = ax1.twinx()
                 ax2.plot(rsi_df['datetime'], rsi_df['rsi'], 'cyan')
                 ax2.set_ylabel('RSI', color='cyan')
                 ax2.axhline(70, color='red', ls='--')
                 ax2.axhline(30, color='green', ls='--')
+                ax2.tick_params(colors='white')
             fig.patch.set_facecolor('#000')
             ax1.set_facecolor('#000')
             ax1.tick_params(colors='white')
-            ax2.tick_params(colors='white')
             st.pyplot(fig)
 
     with tabs[1]:  # Sniping
-        opps = sniping_opps(auctions, item_id, api.get_connected_realm_id(realm))
-        if opps: st.table(opps)
-        else: st.info("No snipes found.")
+        if client:
+            opps = client.get_all('opportunities', realm=realm_cr, item=item_id)
+            if not opps.empty: st.table(opps)
+            else: st.info("No snipes found.")
+        else:
+            opps = sniping_opps(auctions, item_id, realm_cr)
+            if opps: st.table(opps)
+            else: st.info("No snipes found.")
 
     with tabs[2]:  # Flips
-        flips = vendor_flips(auctions, api)
-        if flips: st.table(flips)
-        else: st.info("No flips.")
+        if auctions:
+            flips = vendor_flips(auctions, api)
+            if flips: st.table(flips)
+            else: st.info("No flips.")
+        else: st.info(needs_dump)
 
     with tabs[3]:  # Farms
-        gphs = {k: farm_gph(k, lambda iid: get_unit_price(auctions, iid)) for k in FARMS}
-        st.table(pd.DataFrame.from_dict(gphs, orient='index', columns=['GPH']).sort_values('GPH', ascending=False))
+        if auctions:
+            gphs = {k: farm_gph(k, lambda iid: get_unit_price(auctions, iid)) for k in FARMS}
+            st.table(pd.DataFrame.from_dict(gphs, orient='index', columns=['GPH']).sort_values('GPH', ascending=False))
+        else: st.info(needs_dump)
 
     with tabs[4]:  # Arb
         if multi_auctions: st.table(realm_arb(item_id, multi_auctions))
         else: st.info("Refresh for multi-realm.")
 
     with tabs[5]:  # Posting
-        stats = AuctionAnalyzer.analyze_item(auctions, item_id)
+        if client:
+            row = served.get(item_id)
+            stats = {'min': row['min_price']} if row else None
+            vol = client.get('indicators', realm=realm_cr, item=item_id).get('data', {}).get('volatility') or 0
+        else:
+            stats = AuctionAnalyzer.analyze_item(auctions, item_id)
+            vol = volatility(item_id, realm_cr) if stats else 0
         if stats:
-            vol = volatility(item_id, api.get_connected_realm_id(realm))
             sugg = post_price(stats, vol)
             st.metric("Suggested Price", format_gold(sugg))
 
     with tabs[6]:  # Demand
-        demand = mat_demand(item_id, auctions, api)
-        st.metric("Demand Volume", demand)
+        if auctions:
+            demand = mat_demand(item_id, auctions, api)
+            st.metric("Demand Volume", demand)
+        else: st.info(needs_dump)
 
     with tabs[7]:  # Health
-        health = economy_health(auctions)
-        st.json(health)
+        if auctions:
+            health = economy_health(auctions)
+            st.json(health)
+        else: st.info(needs_dump)
 
     with tabs[8]:  # News
         st.table(RECENT_NEWS)
 
     with tabs[9]:  # Backtest
-        bt = backtest_strategy(item_id, api.get_connected_realm_id(realm))
-        if not bt.empty: st.line_chart(bt.set_index('datetime'))
+        if client:
+            bt = client.get_all('backtest', realm=realm_cr, item=item_id)
+            if not bt.empty: bt['datetime'] = pd.to_datetime(bt['timestamp'], unit='s')
+        else:
+            bt = backtest_strategy(item_id, realm_cr)
+        if not bt.empty: st.line_chart(bt.set_index('datetime')[['price', 'cum_ret']])
 
     with tabs[10]:  # Portfolio
-        pos_json = st.text_area("Positions e.g. [{'item_id':10620, 'qty':100, 'buy_price':8.5}]")
-        if pos_json:
-            try:
-                positions = json.loads(pos_json)
-                val = portfolio_value(positions, lambda iid: get_unit_price(auctions, iid))
-                st.json(val)
-            except: st.error("Invalid JSON.")
+        trade_qty = st.number_input("Trade Qty (negative = sell)", value=0, step=1)
+        trade_price = st.number_input("Unit Price (gold)", value=0.0)
+        if st.button("Record Trade") and trade_qty:
+            Database.record_trade(realm_cr, item_id, int(trade_qty), trade_price)
+        positions = portfolio_positions(realm_cr)
+        if not positions.empty:
+            st.table(positions[['item_id', 'qty', 'avg_cost', 'price', 'realized', 'unrealized', 'total']])
+            mtm = portfolio_history(realm_cr, days=90)
+            if not mtm.empty: st.line_chart(mtm.set_index('datetime')[['value', 'pnl']])
+        else: st.info("No trades recorded.")
+
+    with tabs[11]:  # Correlation
+        window = st.selectbox("Window (snapshots)", CORRELATION_WINDOWS, index=CORRELATION_WINDOWS.index(168))
+        if client:
+            neighbours = client.get_all('correlated', realm=realm_cr, item=item_id, k=10, window=int(window))
+        else:
+            neighbours = top_correlated(item_id, realm_cr, k=10, window=int(window))
+        if not neighbours.empty: st.table(neighbours)
+        else: st.info("Not enough history.")
 
     # Old Crafting (always visible)
     st.markdown("---")
     st.subheader("Crafting Calculator")
+    if not auctions:
+        st.info(needs_dump)
+        return
     recipe = Recipe(recipe_id, api)
     if recipe.data:
         calc = CraftingCalculator(api, auctions)